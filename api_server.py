@@ -3,7 +3,7 @@ import uvicorn
 import json
 import sys
 import io
-from contextlib import redirect_stdout, redirect_stderr
+from contextlib import asynccontextmanager, redirect_stdout, redirect_stderr
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -15,13 +15,20 @@ try:
         get_entity_details,
         build_hierarchy,
         print_tree,
+        warm_up,
     )
     print("Successfully imported retrieve functions")
 except ImportError as e:
     print(f"Error importing retrieve functions: {e}")
     sys.exit(1)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Load the ranking model before serving so the first search does not pay for it
+    warm_up()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,16 +1,120 @@
 import requests
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer, util
 from urllib.parse import quote
 import argparse
+import os
+import sys
+import time
 import warnings
 
 # Suppress the specific PyTorch deprecation warning about encoder_attention_mask
 # This is a known compatibility issue between transformers and PyTorch versions
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*encoder_attention_mask.*")
 
-# Initialize the embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# =================================================================================
+# Embedding model configuration
+# =================================================================================
+# The ranking model backend is selected through environment variables, which are
+# validated at import time so a bad value fails at startup rather than per request:
+#   RANKING_BACKEND         "torch" (default): SentenceTransformer on PyTorch
+#                           "onnx": ONNX Runtime + tokenizers, never imports torch
+#   RANKING_ONNX_FILE       ONNX export to load from the model repo for the "onnx" backend.
+#                           The default fp32 onnx/model.onnx runs on any CPU. The int8
+#                           dynamically quantized exports are tuned per instruction set:
+#                           onnx/model_quint8_avx2.onnx, onnx/model_qint8_avx512.onnx,
+#                           onnx/model_qint8_avx512_vnni.onnx (x86) and
+#                           onnx/model_qint8_arm64.onnx (ARM). Pick the one matching the host.
+#   RANKING_MAX_SEQ_LENGTH  optional cap on tokens per input for the "onnx" backend; company
+#                           names are short, so a small value (e.g. 64) avoids padding work.
+#                           The torch backend always keeps the stock length, so it stays
+#                           a faithful reference for check_backend_parity.
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+STOCK_MAX_SEQ_LENGTH = 256  # max_seq_length shipped with all-MiniLM-L6-v2
+BACKENDS = ('torch', 'onnx')
+
+RANKING_BACKEND = os.environ.get('RANKING_BACKEND', 'torch').strip().lower()
+if RANKING_BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown RANKING_BACKEND '{RANKING_BACKEND}', expected one of {BACKENDS}")
+
+RANKING_ONNX_FILE = os.environ.get('RANKING_ONNX_FILE', 'onnx/model.onnx').strip()
+
+_max_seq_length = os.environ.get('RANKING_MAX_SEQ_LENGTH', '').strip()
+try:
+    RANKING_MAX_SEQ_LENGTH = int(_max_seq_length) if _max_seq_length else STOCK_MAX_SEQ_LENGTH
+except ValueError:
+    raise ValueError(f"RANKING_MAX_SEQ_LENGTH must be an integer, got '{_max_seq_length}'") from None
+if not 0 < RANKING_MAX_SEQ_LENGTH <= STOCK_MAX_SEQ_LENGTH:
+    raise ValueError(f"RANKING_MAX_SEQ_LENGTH must be between 1 and {STOCK_MAX_SEQ_LENGTH}")
+
+class OnnxEncoder:
+    """
+    Encode sentences with an ONNX export of the model: tokenize, run the transformer,
+    mean-pool over the attention mask and L2-normalize, as the SentenceTransformer
+    pipeline does. Returns numpy arrays.
+    """
+
+    def __init__(self, repo_id, file_name, max_seq_length):
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+        import onnxruntime as ort
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo_id, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token='[PAD]')
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            hf_hub_download(repo_id, file_name), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences):
+        batch = self.tokenizer.encode_batch(sentences)
+        attention_mask = np.array([e.attention_mask for e in batch], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([e.ids for e in batch], dtype=np.int64),
+            'attention_mask': attention_mask,
+        }
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in batch], dtype=np.int64)
+
+        token_embs = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(token_embs.dtype)
+        pooled = (token_embs * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+
+_models = {}
+
+def load_model(backend=None):
+    """
+    Load (once) and return the embedding model for the given backend.
+    Defaults to the backend configured via RANKING_BACKEND.
+    """
+    backend = backend or RANKING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend in _models:
+        return _models[backend]
+
+    if backend == 'torch':
+        # Imported here so the onnx backend never pays for the torch import
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+    else:
+        model = OnnxEncoder(MODEL_NAME, RANKING_ONNX_FILE, RANKING_MAX_SEQ_LENGTH)
+
+    _models[backend] = model
+    return model
+
+def warm_up():
+    """
+    Load the configured ranking model and run one encode, so the first search
+    request does not pay for the model download and load.
+    """
+    score_candidates('warm up', ['warm up'])
 
 # =================================================================================
 # Helper functions for searching and ranking names
@@ -24,26 +128,17 @@ def get_ranked_entities(search_term, top_n=5):
         # Empty search term – return empty DataFrame to avoid 400 error
         return pd.DataFrame({'entity': [], 'lei': [], 'score': []})
 
-    encoded = quote(search_term)
-    url = f"https://api.gleif.org/api/v1/autocompletions?field=fulltext&q={encoded}"
     try:
-        resp = requests.get(url, headers={'Accept': 'application/vnd.api+json'})
-        resp.raise_for_status()
-        data = resp.json()
+        entities = get_suggestions(search_term)
     except Exception as e:
         print(f"Error fetching suggestions: {e}")
         return pd.DataFrame()
 
-    entities = [item['attributes']['value'] for item in data.get('data', [])]
     if not entities:
         return pd.DataFrame({'entity': [], 'lei': [], 'score': []})
 
     df = pd.DataFrame({'entity': entities})
-
-    search_emb = model.encode(search_term, convert_to_tensor=True)
-    entity_embs = model.encode(df['entity'].tolist(), convert_to_tensor=True)
-    scores = util.cos_sim(search_emb, entity_embs)[0].tolist()
-    df['score'] = scores
+    df['score'] = score_candidates(search_term, df['entity'].tolist())
     df_sorted = df.sort_values('score', ascending=False).head(top_n)
 
     # fetch LEI codes
@@ -53,6 +148,104 @@ def get_ranked_entities(search_term, top_n=5):
     df_sorted['lei'] = leis
     return df_sorted
 
+def get_suggestions(search_term):
+    """
+    Return the entity names GLEIF autocompletions suggests for a search term.
+    """
+    encoded = quote(search_term)
+    url = f"https://api.gleif.org/api/v1/autocompletions?field=fulltext&q={encoded}"
+    resp = requests.get(url, headers={'Accept': 'application/vnd.api+json'})
+    resp.raise_for_status()
+    return [item['attributes']['value'] for item in resp.json().get('data', [])]
+
+def score_candidates(search_term, candidates, backend=None):
+    """
+    Return the cosine similarity of each candidate name to the search term.
+    """
+    model = load_model(backend)
+    # Both backends return L2-normalized embeddings (OnnxEncoder normalizes, and the
+    # all-MiniLM-L6-v2 SentenceTransformer pipeline ends in a Normalize module),
+    # so the dot product is the cosine similarity
+    embs = np.asarray(model.encode([search_term] + list(candidates)), dtype=np.float32)
+    return (embs[1:] @ embs[0]).tolist()
+
+# Fixed (search term, GLEIF-style candidates) pairs so the parity check is reproducible offline
+PARITY_CASES = [
+    ('3M', ['3M COMPANY', '3M UNITED KINGDOM PUBLIC LIMITED COMPANY', '3M DEUTSCHLAND GMBH',
+            '3M INNOVATIVE PROPERTIES COMPANY', '3M FINANCIAL MANAGEMENT COMPANY',
+            'M3 INC.', '3MV ENERGY CORP.']),
+    ('Apple', ['APPLE INC.', 'APPLE OPERATIONS INTERNATIONAL LIMITED', 'APPLE BANK FOR SAVINGS',
+               'APPLE HOSPITALITY REIT, INC.', 'APPLE DISTRIBUTION INTERNATIONAL LIMITED',
+               'PINEAPPLE ENERGY INC.']),
+    ('Deutsche Bank', ['DEUTSCHE BANK AKTIENGESELLSCHAFT', 'DEUTSCHE BANK TRUST COMPANY AMERICAS',
+                       'DEUTSCHE BANK SECURITIES INC.', 'DEUTSCHE BANK LUXEMBOURG S.A.',
+                       'DEUTSCHE BUNDESBANK', 'DEUTSCHE POSTBANK AG']),
+    ('Toyota', ['TOYOTA MOTOR CORPORATION', 'TOYOTA MOTOR CREDIT CORPORATION',
+                'TOYOTA MOTOR FINANCE (NETHERLANDS) B.V.', 'TOYOTA INDUSTRIES CORPORATION',
+                'TOYOTA TSUSHO CORPORATION', 'TOYOTA MOTOR EUROPE']),
+    ('Nestle', ['NESTLE S.A.', 'NESTLE HOLDINGS, INC.', 'NESTLE FINANCE INTERNATIONAL LTD.',
+                'NESTLE UK LTD', 'NESTLE PURINA PETCARE COMPANY', 'NESTE OYJ']),
+    ('BNP Paribas', ['BNP PARIBAS', 'BNP PARIBAS SECURITIES SERVICES', 'BNP PARIBAS FORTIS',
+                     'BNP PARIBAS ASSET MANAGEMENT FRANCE', 'BNP PARIBAS CARDIF',
+                     'BANK OF NEW YORK MELLON SA/NV']),
+]
+
+def check_backend_parity(search_term, candidates, backend='onnx', top_n=None):
+    """
+    Compare the ranking of an optimized backend against the reference PyTorch backend.
+    Returns True if both backends rank the top_n candidates (all of them by default)
+    in the same order. The API picks matches by position, so every position matters.
+    """
+    if backend == 'torch':
+        raise ValueError("Parity check compares against the torch backend; choose another backend")
+    reference = score_candidates(search_term, candidates, backend='torch')
+    candidate = score_candidates(search_term, candidates, backend=backend)
+
+    def rank(scores):
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order[:top_n]]
+
+    reference_rank = rank(reference)
+    candidate_rank = rank(candidate)
+    max_diff = max((abs(a - b) for a, b in zip(reference, candidate)), default=0.0)
+    matches = reference_rank == candidate_rank
+
+    print(f"Parity check for '{search_term}' (torch vs {backend}): "
+          f"{'OK' if matches else 'MISMATCH'}, max score diff {max_diff:.4f}")
+    if not matches:
+        print(f"   torch:      {reference_rank}")
+        print(f"   {backend}: {candidate_rank}")
+    return matches
+
+def benchmark_backend(backend, runs=50):
+    """
+    Measure cold start (model import + load + first encode), mean per-encode latency
+    over PARITY_CASES and peak resident memory for one backend. Run each backend in
+    a fresh process so cold start and memory are not shared between them.
+    """
+    start = time.perf_counter()
+    load_model(backend)
+    score_candidates('warm up', ['warm up'], backend=backend)
+    cold_start = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        for term, candidates in PARITY_CASES:
+            score_candidates(term, candidates, backend=backend)
+    per_encode = (time.perf_counter() - start) / (runs * len(PARITY_CASES))
+
+    try:
+        # Unix only; imported here so retrieve still imports on Windows
+        import resource
+    except ImportError:
+        peak_rss = "unavailable"
+    else:
+        # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_rss = f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor:.0f}MB"
+    print(f"Backend {backend}: cold start {cold_start:.2f}s, "
+          f"per-encode {per_encode * 1000:.2f}ms, peak RSS {peak_rss}")
+
 def get_lei_for_entity_simple(entity_name):
     """Return the LEI code for an entity using fuzzycompletions."""
     try:
@@ -372,6 +565,37 @@ def get_hierarchy_for_selection(search_terms, column_name, match_number):
 # =================================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corporate hierarchy lookup via GLEIF")
+    parser.add_argument('--check-parity', nargs='*', metavar='SEARCH_TERM',
+                        help="Check that --backend ranks candidates the same as the torch backend. "
+                             "Without search terms, uses the offline PARITY_CASES; with search "
+                             "terms, uses live GLEIF suggestions")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Report cold start, per-encode latency and peak memory for --backend")
+    parser.add_argument('--backend', choices=BACKENDS, default='onnx',
+                        help="Backend for --check-parity and --benchmark (default: onnx)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_backend(args.backend)
+        raise SystemExit(0)
+
+    if args.check_parity is not None:
+        if args.backend == 'torch':
+            parser.error("--check-parity compares against torch; choose another --backend")
+        if args.check_parity:
+            cases = []
+            for term in args.check_parity:
+                candidates = get_suggestions(term)
+                if candidates:
+                    cases.append((term, candidates))
+        else:
+            cases = PARITY_CASES
+        all_match = True
+        for term, candidates in cases:
+            all_match = check_backend_parity(term, candidates, backend=args.backend) and all_match
+        raise SystemExit(0 if all_match else 1)
+
     lei_3m = "LUZQVYP4VS22CLWDAR65"  # 3M COMPANY
     hierarchy = build_hierarchy(lei_3m)
     print(f"Full hierarchy for LEI {lei_3m}:")